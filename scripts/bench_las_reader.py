@@ -0,0 +1,151 @@
+"""
+非圧縮LASの読み込みベンチマーク: laspy の chunk_iterator と memmap 直接参照を比べる
+
+    python scripts/bench_las_reader.py --in_las input.las --centers_csv centers.csv --radius 0.5
+    python scripts/bench_las_reader.py --in_las input.las --spread_centers 200 --radius 1.0
+
+- scan:   全点の実座標を計算するだけ（読み込み + スケール適用）
+- filter: 実座標を計算済みの全点に対する球内判定のみ（grid / kdtree）
+- clip:   球内判定して一時ファイルに書き出すまで
+
+clip の差は中心の配置に強く依存する。中心が一部に固まっていれば memmap 版の外接箱による
+事前絞り込みでほとんどの点が落ちるが、中心がファイル全体に散らばっていれば
+どちらの経路も filter の時間が支配的になる。--spread_centers N を指定すると
+ファイルの範囲全体に一様に N 個の中心を置いて計測する。
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import laspy
+
+from pointcloud_core import (
+    GridRadiusFilter,
+    KDTreeRadiusFilter,
+    LasMemmap,
+    clip_las_file,
+    make_radius_filter,
+    read_centers_csv,
+)
+
+
+def scan_laspy(path, chunk_points):
+    n = 0
+    with laspy.open(path) as reader:
+        for points in reader.chunk_iterator(chunk_points):
+            xyz = np.vstack((points.x, points.y, points.z)).T
+            n += len(xyz)
+    return n
+
+
+def scan_memmap(path, chunk_points):
+    n = 0
+    with LasMemmap(path) as las:
+        for window in las.windows(chunk_points):
+            xyz = las.scaled_xyz(window)
+            n += len(xyz)
+    return n
+
+
+def filter_only(filter_cls, centers, radius, xyz_chunks):
+    flt = filter_cls(centers, radius)
+    return sum(int(flt.mask(xyz).sum()) for xyz in xyz_chunks)
+
+
+def clip_laspy(path, centers, radius, out_path, chunk_points):
+    flt = make_radius_filter(centers, radius)
+    n_out = 0
+    with laspy.open(path) as reader:
+        with laspy.open(out_path, mode="w", header=reader.header, do_compress=False) as writer:
+            for points in reader.chunk_iterator(chunk_points):
+                xyz = np.vstack((points.x, points.y, points.z)).T
+                kept = points[flt.mask(xyz)]
+                n_out += len(kept)
+                if len(kept) > 0:
+                    writer.write_points(kept)
+    return n_out
+
+
+def clip_memmap(path, centers, radius, out_path, chunk_points):
+    return clip_las_file(path, centers, radius, out_path, chunk_points)[1]
+
+
+def best_of(repeat, fn, *args):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="laspy chunk_iterator と memmap の比較")
+    ap.add_argument("--in_las", required=True, help="入力LAS（非圧縮）")
+    ap.add_argument("--centers_csv", default=None)
+    ap.add_argument("--spread_centers", type=int, default=0,
+                    help="CSVの代わりにファイル範囲全体へ一様に置く中心の数")
+    ap.add_argument("--radius", type=float, default=0.5)
+    ap.add_argument("--chunk_points", type=int, default=2_000_000)
+    ap.add_argument("--repeat", type=int, default=3, help="各計測の試行回数（最速値を表示）")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    with LasMemmap(args.in_las) as las:
+        total = len(las)
+        xyz_chunks = [las.scaled_xyz(w) for w in las.windows(args.chunk_points)]
+    mins = np.min([xyz.min(axis=0) for xyz in xyz_chunks], axis=0)
+    maxs = np.max([xyz.max(axis=0) for xyz in xyz_chunks], axis=0)
+
+    if args.spread_centers > 0:
+        rng = np.random.default_rng(args.seed)
+        centers = rng.uniform(mins, maxs, (args.spread_centers, 3))
+        source = f"spread uniformly (seed={args.seed})"
+    elif args.centers_csv:
+        centers = read_centers_csv(args.centers_csv)
+        source = args.centers_csv
+    else:
+        ap.error("--centers_csv か --spread_centers を指定してください")
+
+    lo = centers.min(axis=0) - args.radius
+    hi = centers.max(axis=0) + args.radius
+    in_box = sum(int(np.all((xyz >= lo) & (xyz <= hi), axis=1).sum()) for xyz in xyz_chunks)
+    print(f"[info] points={total:,} chunk={args.chunk_points:,} repeat={args.repeat}")
+    print(f"[info] extent min={np.round(mins, 2).tolist()} max={np.round(maxs, 2).tolist()}")
+    print(f"[info] centers={len(centers)} ({source}) radius={args.radius}m "
+          f"in_center_bbox={in_box / max(total, 1):.1%}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_laspy = os.path.join(tmp, "laspy.las")
+        out_memmap = os.path.join(tmp, "memmap.las")
+        rows = [
+            ("scan", "laspy", best_of(args.repeat, scan_laspy, args.in_las, args.chunk_points)),
+            ("scan", "memmap", best_of(args.repeat, scan_memmap, args.in_las, args.chunk_points)),
+            ("filter", "grid", best_of(args.repeat, filter_only, GridRadiusFilter, centers, args.radius,
+                                       xyz_chunks)),
+        ]
+        try:
+            rows.append(("filter", "kdtree", best_of(args.repeat, filter_only, KDTreeRadiusFilter, centers,
+                                                     args.radius, xyz_chunks)))
+        except ImportError:
+            pass
+        rows += [
+            ("clip", "laspy", best_of(args.repeat, clip_laspy, args.in_las, centers, args.radius,
+                                      out_laspy, args.chunk_points)),
+            ("clip", "memmap", best_of(args.repeat, clip_memmap, args.in_las, centers, args.radius,
+                                       out_memmap, args.chunk_points)),
+        ]
+        for task, reader, (sec, result) in rows:
+            rate = total / sec / 1e6 if sec > 0 else float("inf")
+            print(f"{task:6s} {reader:7s} {sec:8.3f}s  {rate:8.1f} Mpts/s  result={result:,}")
+
+        a = laspy.read(out_laspy)
+        b = laspy.read(out_memmap)
+        same = np.array_equal(np.asarray(a.points.array), np.asarray(b.points.array))
+        print(f"[check] laspy={len(a.points):,} memmap={len(b.points):,} identical={same}")
+
+
+if __name__ == "__main__":
+    main()
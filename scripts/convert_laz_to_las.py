@@ -5,7 +5,9 @@ LAZファイルを非圧縮LASファイルに変換するスクリプト
 import argparse
 import laspy
 
-def convert_laz_to_las(input_path, output_path):
+from pointcloud_core import PointCache
+
+def convert_laz_to_las(input_path, output_path, cache_dir=None, cache_max_gb=20.0):
     print(f"読み込み中: {input_path}")
     
     with laspy.open(input_path) as f:
@@ -15,8 +17,13 @@ def convert_laz_to_las(input_path, output_path):
         
         print(f"変換中: {output_path}")
         with laspy.open(output_path, mode="w", header=header, do_compress=False) as writer:
-            for points in f.chunk_iterator(2_000_000):
-                writer.write_points(points)
+            if cache_dir:
+                cached = PointCache(cache_dir, max_bytes=int(cache_max_gb * 1024**3)).open(input_path, log=print)
+                for b in range(cached.block_count):
+                    writer.write_points(cached.point_record(header, cached.block_slice(b)))
+            else:
+                for points in f.chunk_iterator(2_000_000):
+                    writer.write_points(points)
     
     print("✅ 変換完了")
 
@@ -24,6 +31,8 @@ if __name__ == "__main__":
     ap = argparse.ArgumentParser(description="LAZファイルをLASに変換")
     ap.add_argument("--input", required=True, help="入力LAZファイル")
     ap.add_argument("--output", required=True, help="出力LASファイル")
+    ap.add_argument("--cache_dir", default=None, help="展開済み点のキャッシュ先（指定時のみ有効）")
+    ap.add_argument("--cache_max_gb", type=float, default=20.0, help="キャッシュ容量の上限")
     args = ap.parse_args()
     
-    convert_laz_to_las(args.input, args.output)
+    convert_laz_to_las(args.input, args.output, args.cache_dir, args.cache_max_gb)
@@ -0,0 +1,48 @@
+"""
+点群抽出の共通処理
+
+clip_spheres_stream.py / server.py / Pyodide版（variants/app_pyodide.js）で共有する。
+ブラウザでも読み込めるよう、このパッケージは NumPy 以外に必須の依存を持たない
+（SciPy があれば球内判定に cKDTree を使い、point_cache の展開処理は実行時に laspy を import する）。
+"""
+from .centers import parse_centers_csv, read_centers_csv
+from .clip import clip_cached_points, clip_las_records
+from .las_memmap import LasMemmap, clip_las_file
+from .las_records import (
+    BufferSource,
+    JsBufferSource,
+    LasHeaderInfo,
+    LasRecordWriter,
+    is_compressed_las,
+    iter_record_chunks,
+    parse_las_header,
+    point_record_dtype,
+    read_header,
+    scaled_xyz,
+)
+from .point_cache import CachedPoints, PointCache
+from .radius_filter import GridRadiusFilter, KDTreeRadiusFilter, make_radius_filter
+
+__all__ = [
+    "BufferSource",
+    "CachedPoints",
+    "GridRadiusFilter",
+    "JsBufferSource",
+    "KDTreeRadiusFilter",
+    "LasHeaderInfo",
+    "LasMemmap",
+    "LasRecordWriter",
+    "PointCache",
+    "clip_cached_points",
+    "clip_las_file",
+    "clip_las_records",
+    "is_compressed_las",
+    "iter_record_chunks",
+    "make_radius_filter",
+    "parse_centers_csv",
+    "parse_las_header",
+    "point_record_dtype",
+    "read_centers_csv",
+    "read_header",
+    "scaled_xyz",
+]
@@ -0,0 +1,26 @@
+"""
+中心座標CSV（label,x,y,z）の読み込み
+"""
+import numpy as np
+
+
+def parse_centers_csv(text: str) -> np.ndarray:
+    """CSVテキストから中心座標 (N, 3) を取り出す。ヘッダー行・不正行は読み飛ばす。"""
+    rows = []
+    for line in text.splitlines():
+        parts = line.strip().strip(",").split(",")
+        if len(parts) < 4:
+            continue
+        try:
+            x = float(parts[1]); y = float(parts[2]); z = float(parts[3])
+        except ValueError:
+            continue
+        rows.append((x, y, z))
+    if not rows:
+        raise ValueError("CSVから中心座標が読み取れませんでした。")
+    return np.asarray(rows, dtype=np.float64)
+
+
+def read_centers_csv(path: str) -> np.ndarray:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_centers_csv(f.read())
@@ -0,0 +1,50 @@
+"""
+非圧縮LASから中心座標まわりの球内の点だけを抜き出す（NumPyのみ）
+"""
+import numpy as np
+
+from .las_records import LasRecordWriter, as_source, iter_record_chunks, read_header, scaled_xyz
+from .radius_filter import make_radius_filter
+
+
+def clip_las_records(source, centers_xyz, radius, fp, chunk_points=2_000_000, progress=None):
+    """source の点を球内判定して fp にLASとして書き出す。(入力点数, 出力点数) を返す。
+
+    progress を渡すと各チャンク後に progress(入力点数, 出力点数) を呼ぶ。
+    """
+    source = as_source(source)
+    header = read_header(source)
+    prefix = bytes(source.view(0, header.offset_to_point_data))
+    flt = make_radius_filter(centers_xyz, radius)
+
+    writer = LasRecordWriter(fp, header, prefix)
+    total_in = 0
+    for records in iter_record_chunks(source, header, chunk_points):
+        total_in += len(records)
+        m = flt.mask(scaled_xyz(records, header))
+        writer.write(records[m])
+        if progress is not None:
+            progress(total_in, writer.point_count)
+    writer.close()
+    return total_in, writer.point_count
+
+
+def clip_cached_points(points, centers_xyz, radius, header, writer, progress=None):
+    """PointCache のエントリから球内の点を laspy の writer に書き出す。(走査点数, 出力点数) を返す。
+
+    中心群の外接箱と重ならないブロックは列を読まずに飛ばす。
+    """
+    flt = make_radius_filter(centers_xyz, radius)
+    blocks = points.blocks_in_bounds(flt.bounds[0], flt.bounds[1])
+    total_in = 0
+    total_out = 0
+    for b in blocks:
+        s = points.block_slice(int(b))
+        idx = np.flatnonzero(flt.mask(points.scaled_xyz(s))) + s.start
+        total_in += s.stop - s.start
+        total_out += len(idx)
+        if len(idx) > 0:
+            writer.write_points(points.point_record(header, idx))
+        if progress is not None:
+            progress(total_in, total_out)
+    return total_in, total_out
@@ -0,0 +1,117 @@
+"""
+非圧縮LASの点データ領域を np.memmap で直接参照する
+
+点フォーマット（0〜10）とレコード長・Extra Bytes VLR から作った構造化dtypeで
+点データ領域をそのままマップし、チャンクごとのビュー（コピーなし）を返す。
+フィルタはマップされたページ上で直接動き、書き出しはチャンクごとに1回の
+ファンシーインデックスで選択レコードをコピーするだけになる。
+"""
+import os
+
+import numpy as np
+
+from .las_records import LasHeaderInfo, LasRecordWriter, parse_las_header, scaled_xyz
+from .radius_filter import make_radius_filter
+
+
+class LasMemmap:
+    """非圧縮LASファイルを読み取り専用でマップする。
+
+    with 文を抜ける（close する）とこのオブジェクトはマップへの参照を手放す。
+    それまでに取り出したビューは引き続き読めるが、ファイルは最後のビューが
+    回収されるまでマップされたままになる（Windows では削除・上書きできない）。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(375)
+            offset = parse_las_header(head).offset_to_point_data
+            if offset > len(head):
+                f.seek(0)
+                head = f.read(offset)
+        self.header: LasHeaderInfo = parse_las_header(head)
+        # ヘッダー + VLR（出力時にそのまま使う）
+        self.prefix = head[: self.header.offset_to_point_data]
+
+        h = self.header
+        available = (os.path.getsize(path) - h.offset_to_point_data) // h.record_length
+        count = min(h.point_count, max(available, 0))
+        if count > 0:
+            self.points = np.memmap(path, dtype=h.dtype, mode="r", offset=h.offset_to_point_data, shape=(count,))
+        else:
+            self.points = np.empty(0, dtype=h.dtype)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def windows(self, chunk_points: int = 2_000_000):
+        """chunk_points 点ずつの memmap ビューを返す（データはコピーしない）。"""
+        for start in range(0, len(self.points), chunk_points):
+            yield self.points[start:start + chunk_points]
+
+    def scaled_xyz(self, records: np.ndarray) -> np.ndarray:
+        return scaled_xyz(records, self.header)
+
+    def raw_bounds(self, mins, maxs):
+        """実座標の範囲を整数座標（X/Y/Z の生値）の範囲に直す。"""
+        h = self.header
+        a = (np.asarray(mins, dtype=np.float64) - h.offsets) / h.scales
+        b = (np.asarray(maxs, dtype=np.float64) - h.offsets) / h.scales
+        return np.floor(np.minimum(a, b)), np.ceil(np.maximum(a, b))
+
+    def box_fraction(self, mins, maxs) -> float:
+        """実座標の箱 [mins, maxs] がヘッダーの範囲の体積に占める割合（範囲が不正なら 1.0）。"""
+        h = self.header
+        extent = h.maxs - h.mins
+        if not (np.all(np.isfinite(extent)) and np.all(extent > 0)):
+            return 1.0
+        overlap = np.minimum(maxs, h.maxs) - np.maximum(mins, h.mins)
+        return float(np.prod(np.clip(overlap, 0, None) / extent))
+
+    def in_raw_bounds(self, records: np.ndarray, lo, hi) -> np.ndarray:
+        """整数座標のままで範囲内判定する（マップされたページを直接読む）。"""
+        m = np.ones(len(records), dtype=bool)
+        for i, name in enumerate(("X", "Y", "Z")):
+            col = records[name]
+            m &= (col >= lo[i]) & (col <= hi[i])
+        return m
+
+    def close(self) -> None:
+        # マップ自体は閉じずに参照だけ手放す。windows() のビューが残っていれば、
+        # 最後のビューが回収された時点で NumPy がアンマップする
+        self.points = np.empty(0, dtype=self.header.dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def clip_las_file(in_path, centers_xyz, radius, out_path, chunk_points=2_000_000, progress=None):
+    """非圧縮LASを memmap で読み、球内の点を out_path に書き出す。(入力点数, 出力点数) を返す。"""
+    flt = make_radius_filter(centers_xyz, radius)
+    total_in = 0
+    with LasMemmap(in_path) as las, open(out_path, "wb") as out:
+        writer = LasRecordWriter(out, las.header, las.prefix)
+        lo, hi = las.raw_bounds(*flt.bounds)
+        # 中心群の外接箱がファイルの範囲の大半を覆う（中心が全体に散らばっている）なら
+        # 事前の絞り込みはほぼ何も落とさないので行わない
+        prefilter = las.box_fraction(*flt.bounds) < 0.5
+        for window in las.windows(chunk_points):
+            total_in += len(window)
+            if not prefilter:
+                idx = np.flatnonzero(flt.mask(las.scaled_xyz(window)))
+            else:
+                # 中心群の外接箱で先に絞り、候補だけ実座標にして球内判定する
+                idx = np.flatnonzero(las.in_raw_bounds(window, lo, hi))
+            if prefilter and len(idx) > 0:
+                xyz = np.column_stack([window[name][idx] for name in ("X", "Y", "Z")]) * las.header.scales
+                idx = idx[flt.mask(xyz + las.header.offsets)]
+            if len(idx) > 0:
+                writer.write(window[idx])
+            if progress is not None:
+                progress(total_in, writer.point_count)
+        writer.close()
+    return total_in, writer.point_count
@@ -0,0 +1,360 @@
+"""
+非圧縮LASの点レコードをNumPyだけで読み書きする
+
+laspy を使わずにヘッダーを解釈し、点データ領域を構造化dtypeとして
+チャンク単位で参照する。bytes / mmap などバッファはコピーせずに memoryview で切り出す。
+"""
+import struct
+from dataclasses import dataclass, field
+
+import numpy as np
+
+LAS_SIGNATURE = b"LASF"
+# LAS 1.4 ヘッダー長（これ以上は読まない）
+MAX_HEADER_SIZE = 375
+
+_XYZ = [("X", "<i4"), ("Y", "<i4"), ("Z", "<i4")]
+_RGB = [("red", "<u2"), ("green", "<u2"), ("blue", "<u2")]
+_WAVE = [
+    ("wavepacket_index", "u1"),
+    ("wavepacket_offset", "<u8"),
+    ("wavepacket_size", "<u4"),
+    ("return_point_wave_location", "<f4"),
+    ("x_t", "<f4"),
+    ("y_t", "<f4"),
+    ("z_t", "<f4"),
+]
+_LEGACY_BASE = _XYZ + [
+    ("intensity", "<u2"),
+    ("bit_fields", "u1"),
+    ("raw_classification", "u1"),
+    ("scan_angle_rank", "i1"),
+    ("user_data", "u1"),
+    ("point_source_id", "<u2"),
+]
+_EXTENDED_BASE = _XYZ + [
+    ("intensity", "<u2"),
+    ("bit_fields", "u1"),
+    ("classification_flags", "u1"),
+    ("classification", "u1"),
+    ("user_data", "u1"),
+    ("scan_angle", "<i2"),
+    ("point_source_id", "<u2"),
+    ("gps_time", "<f8"),
+]
+_GPS = [("gps_time", "<f8")]
+
+# 点フォーマットID -> 標準フィールド
+POINT_FORMAT_FIELDS = {
+    0: _LEGACY_BASE,
+    1: _LEGACY_BASE + _GPS,
+    2: _LEGACY_BASE + _RGB,
+    3: _LEGACY_BASE + _GPS + _RGB,
+    4: _LEGACY_BASE + _GPS + _WAVE,
+    5: _LEGACY_BASE + _GPS + _RGB + _WAVE,
+    6: _EXTENDED_BASE,
+    7: _EXTENDED_BASE + _RGB,
+    8: _EXTENDED_BASE + _RGB + [("nir", "<u2")],
+    9: _EXTENDED_BASE + _WAVE,
+    10: _EXTENDED_BASE + _RGB + [("nir", "<u2")] + _WAVE,
+}
+
+
+# Extra Bytes VLR の data_type 1〜10 に対応する型
+_EXTRA_BYTES_TYPES = ["u1", "i1", "<u2", "<i2", "<u4", "<i4", "<u8", "<i8", "<f4", "<f8"]
+_EXTRA_BYTES_RECORD_SIZE = 192
+
+
+def parse_extra_bytes_vlr(payload: bytes, point_format: int) -> list:
+    """Extra Bytes VLR（LASF_Spec / 4）の本体から (名前, dtype) のリストを作る。
+
+    名前が重複・空、または point_format の標準フィールドや extra_bytes と衝突する場合は
+    _2, _3 ... を付けて一意にする（他の点フォーマットのフィールド名はそのまま使える）。
+    """
+    dims = []
+    used = {name for name, _ in POINT_FORMAT_FIELDS.get(point_format, [])} | {"extra_bytes"}
+    for pos in range(0, len(payload) - _EXTRA_BYTES_RECORD_SIZE + 1, _EXTRA_BYTES_RECORD_SIZE):
+        data_type, options = payload[pos + 2], payload[pos + 3]
+        name = payload[pos + 4:pos + 36].split(b"\0", 1)[0].decode("ascii", errors="replace")
+        if data_type == 0:
+            # 型なし: options にバイト数が入る
+            dtype = f"V{options}"
+        elif data_type <= 30:
+            # 11〜30 は旧仕様の2要素・3要素配列
+            base = _EXTRA_BYTES_TYPES[(data_type - 1) % 10]
+            count = 1 if data_type <= 10 else (2 if data_type <= 20 else 3)
+            dtype = base if count == 1 else f"({count},){base}"
+        else:
+            # 解釈できない定義があれば名前付けをやめ、extra_bytes としてまとめて扱う
+            return []
+        base_name = name or f"extra_{len(dims)}"
+        unique, n = base_name, 1
+        while unique in used:
+            n += 1
+            unique = f"{base_name}_{n}"
+        used.add(unique)
+        dims.append((unique, dtype))
+    return dims
+
+
+def parse_vlrs(prefix: bytes, header_size: int, number_of_vlrs: int) -> dict:
+    """ヘッダー直後のVLRを {(user_id, record_id): 本体} として返す。"""
+    vlrs = {}
+    pos = header_size
+    for _ in range(number_of_vlrs):
+        if pos + 54 > len(prefix):
+            break
+        user_id = prefix[pos + 2:pos + 18].split(b"\0", 1)[0].decode("ascii", errors="replace")
+        record_id, length = struct.unpack_from("<HH", prefix, pos + 18)
+        vlrs[(user_id, record_id)] = prefix[pos + 54:pos + 54 + length]
+        pos += 54 + length
+    return vlrs
+
+
+def point_record_dtype(point_format: int, record_length: int, extra_dims=None) -> np.dtype:
+    """点フォーマットとレコード長から構造化dtypeを作る。
+
+    標準部分を超えるバイトは extra_dims（Extra Bytes VLR 由来の (名前, dtype)）で名前を付け、
+    それでも余るバイトや extra_dims がレコード長と合わない場合は extra_bytes にまとめる。
+    """
+    if point_format not in POINT_FORMAT_FIELDS:
+        raise ValueError(f"未対応の点フォーマットです: {point_format}")
+    fields = list(POINT_FORMAT_FIELDS[point_format])
+    base = np.dtype(fields)
+    if record_length < base.itemsize:
+        raise ValueError(
+            f"レコード長 {record_length} が点フォーマット {point_format} の最小長 {base.itemsize} より短いです"
+        )
+    remaining = record_length - base.itemsize
+    if extra_dims:
+        names = {name for name, _ in fields}
+        extra = [(name, dt) for name, dt in extra_dims if name not in names]
+        try:
+            extra_dtype = np.dtype(extra) if len(extra) == len(extra_dims) else None
+        except (TypeError, ValueError):
+            # 名前の重複など、dtype にできない定義はまとめて extra_bytes として扱う
+            extra_dtype = None
+        if extra_dtype is not None and extra_dtype.itemsize <= remaining:
+            fields += extra
+            remaining -= extra_dtype.itemsize
+    if remaining > 0:
+        fields.append(("extra_bytes", f"V{remaining}"))
+    return np.dtype(fields)
+
+
+@dataclass
+class LasHeaderInfo:
+    version: tuple
+    header_size: int
+    offset_to_point_data: int
+    point_format: int
+    record_length: int
+    point_count: int
+    scales: np.ndarray
+    offsets: np.ndarray
+    header_bytes: bytes
+    number_of_vlrs: int = 0
+    extra_dims: list = field(default_factory=list)
+    mins: np.ndarray = None
+    maxs: np.ndarray = None
+
+    @property
+    def dtype(self) -> np.dtype:
+        return point_record_dtype(self.point_format, self.record_length, self.extra_dims)
+
+    @property
+    def is_extended(self) -> bool:
+        return self.point_format >= 6
+
+
+def is_compressed_las(head) -> bool:
+    """先頭バイト列がLAZ（点フォーマットIDの圧縮ビットが立っている）か判定する。"""
+    head = bytes(head[:105])
+    return len(head) >= 105 and head[:4] == LAS_SIGNATURE and bool(head[104] & 0xC0)
+
+
+def parse_las_header(head) -> LasHeaderInfo:
+    """ヘッダーバイト列を解釈する。点データ開始位置までを渡すと Extra Bytes VLR も読む。"""
+    head = bytes(head)
+    if len(head) < 227 or head[:4] != LAS_SIGNATURE:
+        raise ValueError("LASファイルではありません。")
+    if head[104] & 0xC0:
+        raise ValueError("LAZ圧縮ファイルです。非圧縮LASに変換してから読み込んでください。")
+
+    version = (head[24], head[25])
+    header_size, offset_to_point_data, number_of_vlrs = struct.unpack_from("<HII", head, 94)
+    point_format = head[104]
+    record_length, legacy_count = struct.unpack_from("<HI", head, 105)
+    scales = np.array(struct.unpack_from("<3d", head, 131))
+    offsets = np.array(struct.unpack_from("<3d", head, 155))
+    max_x, min_x, max_y, min_y, max_z, min_z = struct.unpack_from("<6d", head, 179)
+
+    point_count = legacy_count
+    if version >= (1, 4) and len(head) >= MAX_HEADER_SIZE:
+        extended_count = struct.unpack_from("<Q", head, 247)[0]
+        if extended_count:
+            point_count = extended_count
+
+    extra_dims = []
+    payload = parse_vlrs(head, header_size, number_of_vlrs).get(("LASF_Spec", 4))
+    if payload:
+        extra_dims = parse_extra_bytes_vlr(payload, point_format)
+
+    return LasHeaderInfo(
+        version=version,
+        header_size=header_size,
+        offset_to_point_data=offset_to_point_data,
+        point_format=point_format,
+        record_length=record_length,
+        point_count=point_count,
+        scales=scales,
+        offsets=offsets,
+        header_bytes=head[:header_size],
+        number_of_vlrs=number_of_vlrs,
+        extra_dims=extra_dims,
+        mins=np.array([min_x, min_y, min_z]),
+        maxs=np.array([max_x, max_y, max_z]),
+    )
+
+
+class BufferSource:
+    """bytes / bytearray / mmap など buffer protocol を持つオブジェクトをコピーせずに切り出す。"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self.byte_length = len(self._view)
+
+    def view(self, start: int, stop: int) -> memoryview:
+        return self._view[start:stop]
+
+
+class JsBufferSource:
+    """Pyodide の JsProxy（Uint8Array）からチャンクごとに再利用バッファへ転送する。
+
+    JS側の ArrayBuffer は WASM ヒープと別領域なので丸ごとの to_py() は避け、
+    1チャンク分の bytearray に assign_to で書き込む。返すビューは次の view() 呼び出しまで有効。
+    """
+
+    def __init__(self, js_array):
+        self._js = js_array
+        self.byte_length = int(js_array.byteLength)
+        self._scratch = bytearray()
+
+    def view(self, start: int, stop: int) -> memoryview:
+        stop = min(stop, self.byte_length)
+        n = max(stop - start, 0)
+        if len(self._scratch) < n:
+            self._scratch = bytearray(n)
+        out = memoryview(self._scratch)[:n]
+        if n:
+            self._js.subarray(start, stop).assign_to(out)
+        return out
+
+
+def as_source(obj):
+    """view(start, stop) を持つソースに正規化する。"""
+    if hasattr(obj, "view") and hasattr(obj, "byte_length"):
+        return obj
+    if hasattr(obj, "assign_to") or hasattr(obj, "subarray"):
+        return JsBufferSource(obj)
+    return BufferSource(obj)
+
+
+def read_header(source) -> LasHeaderInfo:
+    """ヘッダーとVLR（点データ開始位置まで）を読んで解釈する。"""
+    source = as_source(source)
+    head = bytes(source.view(0, min(source.byte_length, MAX_HEADER_SIZE)))
+    offset_to_point_data = parse_las_header(head).offset_to_point_data
+    if offset_to_point_data > len(head):
+        head = bytes(source.view(0, min(source.byte_length, offset_to_point_data)))
+    return parse_las_header(head)
+
+
+def iter_record_chunks(source, header: LasHeaderInfo, chunk_points: int = 2_000_000):
+    """点データ領域を chunk_points 点ずつの構造化配列（バッファのビュー）として返す。"""
+    source = as_source(source)
+    dtype = header.dtype
+    start = header.offset_to_point_data
+    available = (source.byte_length - start) // header.record_length
+    total = min(header.point_count, max(available, 0))
+    done = 0
+    while done < total:
+        n = min(chunk_points, total - done)
+        begin = start + done * header.record_length
+        yield np.frombuffer(source.view(begin, begin + n * header.record_length), dtype=dtype, count=n)
+        done += n
+
+
+def scaled_xyz(records: np.ndarray, header: LasHeaderInfo) -> np.ndarray:
+    """整数座標にスケール・オフセットを適用した (N, 3) float64 を返す。"""
+    xyz = np.empty((len(records), 3), dtype=np.float64)
+    for i, name in enumerate(("X", "Y", "Z")):
+        np.multiply(records[name], header.scales[i], out=xyz[:, i])
+        xyz[:, i] += header.offsets[i]
+    return xyz
+
+
+class LasRecordWriter:
+    """入力LASのヘッダー・VLRをそのまま使い、選択した点レコードを書き出す。
+
+    点数・リターン別点数・座標範囲は close() でヘッダーに書き戻すため fp はシーク可能であること。
+    EVLR（LAS 1.3 の波形データ、1.4 のEVLR）は引き継がない。
+    """
+
+    def __init__(self, fp, header: LasHeaderInfo, prefix: bytes):
+        self._fp = fp
+        self._header = header
+        self._start = fp.tell()
+        self._count = 0
+        self._returns = np.zeros(15, dtype=np.int64)
+        self._min = np.full(3, np.iinfo(np.int64).max)
+        self._max = np.full(3, np.iinfo(np.int64).min)
+        fp.write(prefix[: header.offset_to_point_data])
+
+    def write(self, records: np.ndarray) -> None:
+        if len(records) == 0:
+            return
+        records = np.ascontiguousarray(records, dtype=self._header.dtype)
+        self._fp.write(records.tobytes())
+        self._count += len(records)
+
+        mask = 0x0F if self._header.is_extended else 0x07
+        return_numbers = records["bit_fields"] & mask
+        counts = np.bincount(return_numbers, minlength=16)
+        self._returns += counts[1:16]
+        for i, name in enumerate(("X", "Y", "Z")):
+            self._min[i] = min(self._min[i], int(records[name].min()))
+            self._max[i] = max(self._max[i], int(records[name].max()))
+
+    @property
+    def point_count(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        h = self._header
+        end = self._fp.tell()
+        fp = self._fp
+
+        legacy_ok = not h.is_extended and self._count <= 0xFFFFFFFF
+        fp.seek(self._start + 107)
+        fp.write(struct.pack("<I", self._count if legacy_ok else 0))
+        legacy_returns = self._returns[:5] if legacy_ok else np.zeros(5, dtype=np.int64)
+        fp.write(struct.pack("<5I", *(int(v) for v in legacy_returns)))
+
+        if self._count:
+            mins = self._min * h.scales + h.offsets
+            maxs = self._max * h.scales + h.offsets
+        else:
+            mins = maxs = np.zeros(3)
+        fp.seek(self._start + 179)
+        fp.write(struct.pack("<6d", maxs[0], mins[0], maxs[1], mins[1], maxs[2], mins[2]))
+
+        if h.version >= (1, 3) and h.header_size >= 235:
+            fp.seek(self._start + 227)
+            fp.write(struct.pack("<Q", 0))
+        if h.version >= (1, 4) and h.header_size >= MAX_HEADER_SIZE:
+            fp.seek(self._start + 235)
+            fp.write(struct.pack("<QI", 0, 0))
+            fp.write(struct.pack("<Q", self._count))
+            fp.write(struct.pack("<15Q", *(int(v) for v in self._returns)))
+        fp.seek(end)
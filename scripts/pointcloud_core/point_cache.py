@@ -0,0 +1,279 @@
+"""
+LAZ展開済み点の列指向キャッシュ（オプトイン）
+
+同じLAZに対して中心抽出・ポリゴン・断面と処理を繰り返すと、毎回のLAZ展開が支配的になる。
+初回読み込み時に各次元を列ごとの .npy（X/Y/Z は int32 の生値）として保存し、
+2回目以降は必要な列・ブロックだけを np.load(mmap_mode="r") で読む。
+
+    <cache_dir>/
+        index.json              パス -> (サイズ, mtime, ヘッダー, キー) の対応（再ハッシュ省略用）
+        <key>/meta.json         点数・列のdtype・ブロック毎の min/max・最終利用時刻
+        <key>/<次元名>.npy
+
+キーはファイル内容のSHA-256とヘッダーバイト列から作るため、元ファイルが変われば別エントリになる。
+合計サイズが max_bytes を超えたら最終利用時刻の古いエントリから削除する（LRU）。
+展開には laspy を使うが、import は構築時まで遅らせる（Pyodide側では読み込まない）。
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_BLOCK_POINTS = 1 << 20
+DEFAULT_MAX_BYTES = 20 * 1024**3
+_HASH_READ_SIZE = 16 * 1024 * 1024
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        p = os.path.join(path, name)
+        if os.path.isfile(p):
+            total += os.path.getsize(p)
+    return total
+
+
+def _write_json(path: str, obj) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+class CachedPoints:
+    """キャッシュ済み1ファイル分。列は必要になった時点で memmap する。"""
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self.point_count = int(meta["point_count"])
+        self.block_points = int(meta["block_points"])
+        self.scales = np.asarray(meta["scales"], dtype=np.float64)
+        self.offsets = np.asarray(meta["offsets"], dtype=np.float64)
+        self._columns = {}
+
+    @property
+    def dimension_names(self):
+        return list(self.meta["columns"])
+
+    @property
+    def block_count(self) -> int:
+        return len(self.meta["block_ranges"])
+
+    def column(self, name: str) -> np.ndarray:
+        """列全体を読み取り専用 memmap として返す。"""
+        if name not in self._columns:
+            if name not in self.meta["columns"]:
+                raise KeyError(f"キャッシュに列がありません: {name}")
+            self._columns[name] = np.load(os.path.join(self.path, name + ".npy"), mmap_mode="r")
+        return self._columns[name]
+
+    def block_slice(self, block: int) -> slice:
+        start, stop = self.meta["block_ranges"][block]
+        return slice(start, stop)
+
+    def block_stats(self, name: str):
+        """列 name のブロック毎 (min, max) を (B, 2) 配列で返す。統計のない列は None。"""
+        stats = self.meta["block_stats"].get(name)
+        return None if stats is None else np.asarray(stats)
+
+    def blocks_in_bounds(self, mins, maxs):
+        """実座標の範囲 [mins, maxs] と重なり得るブロック番号を返す。"""
+        if self.block_count == 0:
+            return np.empty(0, dtype=np.intp)
+        mins = np.asarray(mins, dtype=np.float64)
+        maxs = np.asarray(maxs, dtype=np.float64)
+        keep = np.ones(self.block_count, dtype=bool)
+        for i, name in enumerate(("X", "Y", "Z")):
+            stats = self.block_stats(name)
+            lo = stats[:, 0] * self.scales[i] + self.offsets[i]
+            hi = stats[:, 1] * self.scales[i] + self.offsets[i]
+            # スケールが負でも大小関係が崩れないよう並べ替える
+            lo, hi = np.minimum(lo, hi), np.maximum(lo, hi)
+            keep &= (hi >= mins[i]) & (lo <= maxs[i])
+        return np.flatnonzero(keep)
+
+    def iter_blocks(self, columns, blocks=None):
+        """(ブロック番号, {列名: 配列}) を返す。blocks を省略すると全ブロック。"""
+        cols = {name: self.column(name) for name in columns}
+        if blocks is None:
+            blocks = range(self.block_count)
+        for b in blocks:
+            s = self.block_slice(int(b))
+            yield int(b), {name: arr[s] for name, arr in cols.items()}
+
+    def scaled_xyz(self, index) -> np.ndarray:
+        """index（スライス・整数配列）の点の実座標 (N, 3) を返す。"""
+        xyz = np.empty((len(self.column("X")[index]), 3), dtype=np.float64)
+        for i, name in enumerate(("X", "Y", "Z")):
+            np.multiply(self.column(name)[index], self.scales[i], out=xyz[:, i])
+            xyz[:, i] += self.offsets[i]
+        return xyz
+
+    def point_record(self, header, index):
+        """index の点を laspy の点レコードとして組み立てる（書き出し用）。"""
+        import laspy
+
+        first = self.column("X")[index]
+        record = laspy.ScaleAwarePointRecord.zeros(len(first), header=header)
+        for name in self.dimension_names:
+            record[name] = self.column(name)[index]
+        return record
+
+
+class PointCache:
+    """LAZ/LASの展開結果をディスクに保持する。"""
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES, block_points: int = DEFAULT_BLOCK_POINTS):
+        self.root = os.path.abspath(root)
+        self.max_bytes = int(max_bytes)
+        self.block_points = int(block_points)
+        os.makedirs(self.root, exist_ok=True)
+        self._index_path = os.path.join(self.root, "index.json")
+
+    def file_key(self, path: str) -> str:
+        """ファイル内容とヘッダーからキャッシュキーを作る。サイズ・mtime・ヘッダーが同じなら前回のキーを使う。"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            header_bytes = f.read(375)
+        index = _read_json(self._index_path, {})
+        memo = index.get(path)
+        # cp -p / rsync -t などでサイズとmtimeが保たれた差し替えもあるので、ヘッダーも照合する
+        if (memo and memo["size"] == st.st_size and memo["mtime_ns"] == st.st_mtime_ns
+                and memo.get("header") == header_bytes.hex()):
+            return memo["key"]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(_HASH_READ_SIZE)
+                if not block:
+                    break
+                h.update(block)
+        key = hashlib.sha256(
+            f"v{CACHE_FORMAT_VERSION}:{self.block_points}:".encode() + header_bytes + h.digest()
+        ).hexdigest()[:32]
+
+        # 一時ファイルなど既に存在しないパスは対応表から落とす
+        index = {p: v for p, v in index.items() if os.path.exists(p)}
+        index[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "header": header_bytes.hex(), "key": key}
+        _write_json(self._index_path, index)
+        return key
+
+    def open(self, path: str, chunk_points: int = 2_000_000, log=None) -> CachedPoints:
+        """キャッシュがあれば開き、なければ path を展開して作成する。"""
+        key = self.file_key(path)
+        entry_dir = os.path.join(self.root, key)
+        meta = _read_json(os.path.join(entry_dir, "meta.json"))
+        if meta is None or meta.get("version") != CACHE_FORMAT_VERSION:
+            if log:
+                log(f"[cache] miss {os.path.basename(path)} -> {key}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            meta = self._build(path, entry_dir, chunk_points)
+        elif log:
+            log(f"[cache] hit {os.path.basename(path)} -> {key}")
+
+        meta["last_access"] = time.time()
+        _write_json(os.path.join(entry_dir, "meta.json"), meta)
+        self.evict(keep=key)
+        return CachedPoints(entry_dir, meta)
+
+    def _build(self, path: str, entry_dir: str, chunk_points: int) -> dict:
+        import laspy
+
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            with laspy.open(path) as reader:
+                hdr = reader.header
+                n = int(hdr.point_count)
+                columns = {}
+                arrays = {}
+                stats = {}
+                # 列は点数0でも作っておく（dtype は空の点レコードから取る）
+                empty = laspy.ScaleAwarePointRecord.zeros(0, header=hdr)
+                for name in hdr.point_format.dimension_names:
+                    sample = np.asarray(empty[name])
+                    columns[name] = sample.dtype.str
+                    arrays[name] = np.lib.format.open_memmap(
+                        os.path.join(tmp_dir, name + ".npy"),
+                        mode="w+", dtype=sample.dtype, shape=(n,) + sample.shape[1:],
+                    )
+                done = 0
+                for points in reader.chunk_iterator(chunk_points):
+                    m = len(points)
+                    for name, arr in arrays.items():
+                        arr[done:done + m] = np.asarray(points[name])
+                    done += m
+                if done != n:
+                    raise ValueError(f"点数がヘッダーと一致しません: header={n} read={done}")
+
+                ranges = [[s, min(s + self.block_points, n)] for s in range(0, n, self.block_points)]
+                for name, arr in arrays.items():
+                    arr.flush()
+                    if arr.ndim != 1 or arr.dtype.kind not in "biuf":
+                        continue
+                    stats[name] = [
+                        [arr[s:e].min().item(), arr[s:e].max().item()] for s, e in ranges
+                    ]
+                arrays.clear()
+
+                meta = {
+                    "version": CACHE_FORMAT_VERSION,
+                    "source": os.path.abspath(path),
+                    "point_count": n,
+                    "point_format": int(hdr.point_format.id),
+                    "scales": [float(v) for v in hdr.scales],
+                    "offsets": [float(v) for v in hdr.offsets],
+                    "block_points": self.block_points,
+                    "block_ranges": ranges,
+                    "block_stats": stats,
+                    "columns": columns,
+                }
+            _write_json(os.path.join(tmp_dir, "meta.json"), meta)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # 同じキャッシュを共有する別プロセスが先に作り終えていれば、そちらを使う
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            existing = _read_json(os.path.join(entry_dir, "meta.json"))
+            if existing is None or existing.get("version") != CACHE_FORMAT_VERSION:
+                raise
+            return existing
+        return meta
+
+    def evict(self, keep: str = None) -> None:
+        """合計サイズが max_bytes 以下になるまで最終利用の古いエントリを削除する。"""
+        entries = []
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+            if not os.path.isdir(entry_dir) or ".tmp-" in name:
+                continue
+            meta = _read_json(os.path.join(entry_dir, "meta.json"), {})
+            entries.append((meta.get("last_access", 0.0), name, _dir_size(entry_dir)))
+
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            total -= size
@@ -0,0 +1,158 @@
+"""
+NumPyのみで動く球状範囲フィルタ（SciPy不要）
+
+中心座標を半径（よりわずかに大きい）サイズの格子に振り分け、各点は自セルと隣接26セルの中心だけを調べる。
+隣接セルの箱まで半径より遠い点や、既に当たった点はそのセルを調べない。
+Pyodide上でもそのまま動くよう、NumPy以外には依存しない。
+"""
+import numpy as np
+
+# 隣接27セルへのオフセット。当たりやすい自セル・面で接するセルから順に調べる
+_NEIGHBOR_OFFSETS = np.array(
+    sorted(
+        [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)],
+        key=lambda d: d[0] * d[0] + d[1] * d[1] + d[2] * d[2],
+    ),
+    dtype=np.int64,
+)
+
+
+class GridRadiusFilter:
+    """いずれかの中心から radius 以内にある点を判定する。"""
+
+    def __init__(self, centers_xyz: np.ndarray, radius: float):
+        centers = np.asarray(centers_xyz, dtype=np.float64).reshape(-1, 3)
+        if len(centers) == 0:
+            raise ValueError("中心座標が空です。")
+        if not radius > 0:
+            raise ValueError("半径は正の値を指定してください。")
+        # 重複した中心は結果を変えずにセル内の走査だけを増やすので落としておく
+        centers = np.unique(centers, axis=0)
+        self.radius = float(radius)
+        self._r2 = self.radius * self.radius
+        # セルは半径よりわずかに大きくする。ちょうど半径だけ離れた点と中心が
+        # 丸め誤差で2セル離れて隣接セルの探索から漏れるのを防ぐ
+        self._cell = self.radius * (1.0 + 1e-6)
+
+        # 中心群の外接箱（半径ぶん拡張）。これより外の点は格子を引かずに除外する
+        self._lo = centers.min(axis=0) - self.radius
+        self._hi = centers.max(axis=0) + self.radius
+
+        # セル番号は隣接オフセット(-1)でも負にならないよう +1 しておく
+        cells = self._cell_index(centers) + 1
+        self._dims = np.floor((self._hi - self._lo) / self._cell).astype(np.int64) + 3
+
+        keys = self._encode(cells)
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._centers = centers[order]
+        # 隣接セルへのオフセットをキーの差分に直したもの
+        self._neighbor_deltas = self._encode(_NEIGHBOR_OFFSETS)
+
+    @property
+    def bounds(self):
+        """判定対象になり得る範囲 (最小, 最大)。"""
+        return self._lo, self._hi
+
+    def _cell_index(self, xyz: np.ndarray) -> np.ndarray:
+        return np.floor((xyz - self._lo) / self._cell).astype(np.int64)
+
+    def _encode(self, cells: np.ndarray) -> np.ndarray:
+        return (cells[:, 0] * self._dims[1] + cells[:, 1]) * self._dims[2] + cells[:, 2]
+
+    def mask(self, points_xyz: np.ndarray) -> np.ndarray:
+        """points_xyz (N, 3) のうち範囲内の点を True とするマスクを返す。"""
+        points_xyz = np.asarray(points_xyz, dtype=np.float64)
+        keep = np.zeros(len(points_xyz), dtype=bool)
+
+        inside = np.all((points_xyz >= self._lo) & (points_xyz <= self._hi), axis=1)
+        candidates = np.flatnonzero(inside)
+        if len(candidates) == 0:
+            return keep
+
+        p = points_xyz[candidates]
+        pos = (p - self._lo) / self._cell
+        cells = np.floor(pos).astype(np.int64)
+        # セル内での位置（0〜1）から、両隣のセルの境界までの距離（セル幅単位）を出しておく
+        frac = pos - cells
+        gaps = {-1: frac, 1: 1.0 - frac}
+        # 点のセルは重複が多いので、中心の探索は異なるセルごとに1回だけ行う
+        cell_keys, inverse = np.unique(self._encode(cells + 1), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        hit = np.zeros(len(p), dtype=bool)
+
+        for offset, delta in zip(_NEIGHBOR_OFFSETS, self._neighbor_deltas):
+            keys = cell_keys + delta
+            cell_start = np.searchsorted(self._keys, keys, side="left")
+            cell_stop = np.searchsorted(self._keys, keys, side="right")
+            # 隣接セルに中心がある点だけを距離計算の対象にする
+            occupied = cell_stop > cell_start
+            if not occupied.any():
+                continue
+            pts = np.flatnonzero(occupied[inverse] & ~hit)
+            # 隣接セルの箱まで半径より遠い点は、そのセルの中心を調べるまでもない
+            # （半径ちょうどの点を丸め誤差で落とさないよう少しだけ余裕を持たせる）
+            if offset.any():
+                gap2 = np.zeros(len(pts))
+                for axis, d in enumerate(offset):
+                    if d:
+                        gap2 += gaps[int(d)][pts, axis] ** 2
+                pts = pts[gap2 <= 1.0 + 1e-9]
+            cur = cell_start[inverse[pts]]
+            stop = cell_stop[inverse[pts]]
+            # セル内の中心を1つずつ調べ、当たった点とセルの中心を調べ尽くした点は
+            # 次から外す。走査回数は最も混んだセルではなく各点のセルの中心数で決まる
+            while len(pts) > 0:
+                diff = p[pts] - self._centers[cur]
+                d2 = np.einsum("ij,ij->i", diff, diff)
+                near = d2 <= self._r2
+                hit[pts[near]] = True
+                cur += 1
+                rest = ~near & (cur < stop)
+                pts, cur, stop = pts[rest], cur[rest], stop[rest]
+
+        keep[candidates] = hit
+        return keep
+
+
+class KDTreeRadiusFilter:
+    """SciPy の cKDTree で最近傍の中心までの距離を見る。GridRadiusFilter と同じインターフェース。"""
+
+    def __init__(self, centers_xyz: np.ndarray, radius: float):
+        from scipy.spatial import cKDTree
+
+        centers = np.asarray(centers_xyz, dtype=np.float64).reshape(-1, 3)
+        if len(centers) == 0:
+            raise ValueError("中心座標が空です。")
+        if not radius > 0:
+            raise ValueError("半径は正の値を指定してください。")
+        self.radius = float(radius)
+        self._tree = cKDTree(centers)
+        self._lo = centers.min(axis=0) - self.radius
+        self._hi = centers.max(axis=0) + self.radius
+
+    @property
+    def bounds(self):
+        """判定対象になり得る範囲 (最小, 最大)。"""
+        return self._lo, self._hi
+
+    def mask(self, points_xyz: np.ndarray) -> np.ndarray:
+        points_xyz = np.asarray(points_xyz, dtype=np.float64)
+        keep = np.zeros(len(points_xyz), dtype=bool)
+        inside = np.flatnonzero(np.all((points_xyz >= self._lo) & (points_xyz <= self._hi), axis=1))
+        if len(inside) == 0:
+            return keep
+        # 上限距離を渡すと遠い点の探索が早く打ち切られる。半径ちょうどの点も残すよう少しだけ広げる
+        bound = np.nextafter(self.radius, np.inf)
+        d, _ = self._tree.query(points_xyz[inside], k=1, distance_upper_bound=bound, workers=-1)
+        keep[inside] = d * d <= self.radius * self.radius
+        return keep
+
+
+def make_radius_filter(centers_xyz: np.ndarray, radius: float):
+    """SciPy があれば cKDTree、なければ（Pyodide など）格子で判定するフィルタを返す。"""
+    try:
+        import scipy.spatial  # noqa: F401
+    except ImportError:
+        return GridRadiusFilter(centers_xyz, radius)
+    return KDTreeRadiusFilter(centers_xyz, radius)
@@ -13,64 +13,58 @@ import shutil
 from urllib.parse import parse_qs
 import sys
 
-# 既存の処理関数をインポート
 import numpy as np
 import laspy
-from scipy.spatial import cKDTree
-
-
-def process_laz_file(laz_path, csv_text, radius):
-    """LAZ/LASファイルを処理"""
-    # CSVを解析
-    centers = []
-    for line in csv_text.strip().split('\n'):
-        line = line.strip()
-        if not line or 'label' in line.lower():
-            continue
-        parts = line.split(',')
-        if len(parts) >= 4:
-            try:
-                x = float(parts[1])
-                y = float(parts[2])
-                z = float(parts[3])
-                centers.append([x, y, z])
-            except:
-                pass
-    
-    if not centers:
-        raise ValueError('CSVから有効な座標が読み取れませんでした')
-    
-    centers = np.array(centers)
+
+from pointcloud_core import (
+    PointCache,
+    clip_cached_points,
+    clip_las_file,
+    is_compressed_las,
+    make_radius_filter,
+    parse_centers_csv,
+)
+
+# --cache_dir 指定時のみ有効（展開済み点のキャッシュ）
+POINT_CACHE = None
+
+
+def process_laz_file(laz_path, csv_text, radius, output_path, chunk_points=2_000_000):
+    """LAZ/LASファイルを処理して output_path にLASを書き出す"""
+    centers = parse_centers_csv(csv_text)
     print(f'中心座標: {len(centers)}件', file=sys.stderr)
-    
-    # LAZ/LASファイルを読み込み
-    las = laspy.read(laz_path)
-    print(f'総点数: {len(las.points)}', file=sys.stderr)
-    
-    # KD-treeを構築
-    tree = cKDTree(centers)
-    
-    # 点群座標を取得
-    points_xyz = np.vstack([las.x, las.y, las.z]).T
-    
-    # 範囲内の点を検索
-    indices = tree.query_ball_point(points_xyz, radius)
-    
-    # フィルタリング
-    mask = np.array([len(idx) > 0 for idx in indices])
-    filtered_points = las.points[mask]
-    
-    print(f'抽出点数: {len(filtered_points)}', file=sys.stderr)
-    
-    # 新しいLASファイルを作成
-    header = laspy.LasHeader(point_format=las.header.point_format, version=las.header.version)
-    header.offsets = las.header.offsets
-    header.scales = las.header.scales
-    
-    output_las = laspy.LasData(header)
-    output_las.points = filtered_points
-    
-    return output_las, len(las.points), len(filtered_points)
+
+    with open(laz_path, 'rb') as f:
+        compressed = is_compressed_las(f.read(105))
+
+    if not compressed:
+        # 非圧縮LASは点データ領域をmemmapして直接フィルタ（laspy不要）
+        input_points, output_points = clip_las_file(laz_path, centers, radius, output_path, chunk_points)
+    elif POINT_CACHE is not None:
+        # キャッシュはファイル内容で引くので、アップロードごとの一時ファイルでも再利用される
+        cached = POINT_CACHE.open(laz_path, chunk_points, log=lambda msg: print(msg, file=sys.stderr))
+        with laspy.open(laz_path) as reader:
+            header = reader.header
+        with laspy.open(output_path, mode='w', header=header, do_compress=False) as writer:
+            _, output_points = clip_cached_points(cached, centers, radius, header, writer)
+        input_points = cached.point_count
+    else:
+        flt = make_radius_filter(centers, radius)
+        input_points = 0
+        output_points = 0
+        with laspy.open(laz_path) as reader:
+            with laspy.open(output_path, mode='w', header=reader.header, do_compress=False) as writer:
+                for points in reader.chunk_iterator(chunk_points):
+                    input_points += len(points)
+                    xyz = np.vstack((points.x, points.y, points.z)).T
+                    kept = points[flt.mask(xyz)]
+                    output_points += len(kept)
+                    if len(kept) > 0:
+                        writer.write_points(kept)
+
+    print(f'総点数: {input_points}', file=sys.stderr)
+    print(f'抽出点数: {output_points}', file=sys.stderr)
+    return input_points, output_points
 
 
 class LAZHandler(http.server.SimpleHTTPRequestHandler):
@@ -138,13 +132,10 @@ class LAZHandler(http.server.SimpleHTTPRequestHandler):
             
             try:
                 # 処理実行
-                output_las, input_points, output_points = process_laz_file(
-                    laz_temp_path, csv_text, radius
+                input_points, output_points = process_laz_file(
+                    laz_temp_path, csv_text, radius, output_temp_path
                 )
                 
-                # 出力ファイルに書き込み
-                output_las.write(output_temp_path)
-                
                 # 結果ファイルを読み込み
                 with open(output_temp_path, 'rb') as f:
                     result_data = f.read()
@@ -189,6 +180,15 @@ class LAZHandler(http.server.SimpleHTTPRequestHandler):
 
 
 def main():
+    global POINT_CACHE
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--cache_dir', default=None, help='LAZ展開済み点のキャッシュ先（指定時のみ有効）')
+    ap.add_argument('--cache_max_gb', type=float, default=20.0, help='キャッシュ容量の上限（超えたら古いものから削除）')
+    args = ap.parse_args()
+    if args.cache_dir:
+        POINT_CACHE = PointCache(args.cache_dir, max_bytes=int(args.cache_max_gb * 1024**3))
+
     PORT = 8000
     
     print(f"""
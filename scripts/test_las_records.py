@@ -0,0 +1,163 @@
+"""
+pointcloud_core の非圧縮LAS読み書きのテスト（laspy で作ったファイルと照合する）
+
+    python -m pytest scripts/test_las_records.py
+"""
+import io
+import struct
+
+import numpy as np
+import pytest
+
+laspy = pytest.importorskip("laspy")
+
+import pointcloud_core.clip
+from pointcloud_core import GridRadiusFilter, LasMemmap, clip_las_file, clip_las_records, point_record_dtype
+from pointcloud_core.las_records import parse_extra_bytes_vlr
+
+RADIUS = 1.0
+
+
+def make_las(path, point_format, version, extra_dims, n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    header = laspy.LasHeader(point_format=point_format, version=version)
+    header.scales = [0.001, 0.001, 0.001]
+    header.offsets = [1000.0, 2000.0, 0.0]
+    for name, dtype in extra_dims:
+        header.add_extra_dim(laspy.ExtraBytesParams(name=name, type=dtype))
+    las = laspy.LasData(header)
+    las.x = rng.uniform(1000, 1020, n)
+    las.y = rng.uniform(2000, 2020, n)
+    las.z = rng.uniform(0, 5, n)
+    las.return_number = rng.integers(1, 4, n)
+    las.number_of_returns = np.full(n, 3)
+    las.intensity = rng.integers(0, 65535, n)
+    for name, dtype in extra_dims:
+        las[name] = rng.integers(0, 100, n).astype(dtype)
+    las.write(str(path))
+    return las
+
+
+@pytest.mark.parametrize("point_format,version", [(0, "1.2"), (1, "1.2"), (3, "1.2"), (6, "1.4"), (8, "1.4")])
+@pytest.mark.parametrize("extra_dims", [[], [("dist", np.float64), ("tag", np.uint16)]])
+def test_clip_las_file_round_trip(tmp_path, point_format, version, extra_dims):
+    src = make_las(tmp_path / "in.las", point_format, version, extra_dims)
+    rng = np.random.default_rng(1)
+    centers = rng.uniform([1000, 2000, 0], [1020, 2020, 5], (30, 3))
+
+    xyz = np.vstack([src.x, src.y, src.z]).T
+    d2 = ((xyz[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+    expected = d2 <= RADIUS * RADIUS
+    assert 0 < expected.sum() < len(xyz)
+
+    out_path = tmp_path / "out.las"
+    n_in, n_out = clip_las_file(str(tmp_path / "in.las"), centers, RADIUS, str(out_path), chunk_points=3_000)
+    assert (n_in, n_out) == (len(xyz), int(expected.sum()))
+
+    got = laspy.read(str(out_path))
+    assert got.header.point_count == n_out
+    assert np.array_equal(np.asarray(got.points.array), np.asarray(src.points.array)[expected])
+
+    return_counts = np.bincount(np.asarray(src.return_number)[expected], minlength=16)[1:]
+    by_return = np.asarray(got.header.number_of_points_by_return)
+    assert np.array_equal(by_return, return_counts[: len(by_return)])
+
+    kept = xyz[expected]
+    assert np.allclose(got.header.mins, kept.min(axis=0), atol=1e-3)
+    assert np.allclose(got.header.maxs, kept.max(axis=0), atol=1e-3)
+
+
+class FakeJsArray:
+    """Pyodide の Uint8Array（JsProxy）の代わり。subarray / assign_to / byteLength だけを持つ。"""
+
+    def __init__(self, data: bytes, start: int = 0, stop: int = None, transfers=None):
+        self._data = data
+        self._start = start
+        self._stop = len(data) if stop is None else stop
+        self.transfers = [] if transfers is None else transfers
+
+    @property
+    def byteLength(self):
+        return self._stop - self._start
+
+    def subarray(self, start, stop):
+        stop = min(stop, self.byteLength)
+        return FakeJsArray(self._data, self._start + start, self._start + stop, self.transfers)
+
+    def assign_to(self, out):
+        # Pyodide と同じく転送先の長さが一致しなければエラーにする
+        if len(out) != self.byteLength:
+            raise ValueError("length mismatch")
+        out[:] = self._data[self._start:self._stop]
+        self.transfers.append(self.byteLength)
+
+
+def test_clip_las_records_from_js_buffer_with_grid(tmp_path, monkeypatch):
+    # Pyodide には SciPy がないので、ブラウザと同じ格子フィルタで通す
+    monkeypatch.setattr(pointcloud_core.clip, "make_radius_filter", GridRadiusFilter)
+    src = make_las(tmp_path / "in.las", 6, "1.4", [("dist", np.float64)], n=10_000)
+    data = (tmp_path / "in.las").read_bytes()
+    centers = np.random.default_rng(1).uniform([1000, 2000, 0], [1020, 2020, 5], (30, 3))
+
+    xyz = np.vstack([src.x, src.y, src.z]).T
+    d2 = ((xyz[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+    expected = d2 <= RADIUS * RADIUS
+
+    js = FakeJsArray(data)
+    out = io.BytesIO()
+    chunk_points = 3_001
+    n_in, n_out = clip_las_records(js, centers, RADIUS, out, chunk_points=chunk_points)
+    assert (n_in, n_out) == (len(xyz), int(expected.sum()))
+    # 全体を一度に転送せず、チャンク単位で受け取っている
+    assert max(js.transfers) <= chunk_points * src.header.point_format.size
+    assert max(js.transfers) < len(data)
+
+    got = laspy.read(io.BytesIO(out.getvalue()))
+    assert got.header.point_count == n_out
+    assert np.array_equal(np.asarray(got.points.array), np.asarray(src.points.array)[expected])
+
+
+def test_memmap_dtype_names_extra_dims(tmp_path):
+    src = make_las(tmp_path / "in.las", 3, "1.2", [("dist", np.float64), ("tag", np.uint16)], n=100)
+    with LasMemmap(str(tmp_path / "in.las")) as las:
+        assert las.points.dtype.itemsize == src.header.point_format.size
+        assert np.array_equal(las.points["tag"], src.tag)
+        window = next(las.windows(10))
+    # close 後もビューは読める
+    assert np.array_equal(window["X"], np.asarray(src.X)[:10])
+
+
+def _extra_bytes_record(name: bytes, data_type: int) -> bytes:
+    return struct.pack("<HBB32s", 0, data_type, 0, name) + bytes(192 - 36)
+
+
+def test_extra_bytes_duplicate_names_are_made_unique():
+    payload = b"".join([
+        _extra_bytes_record(b"a", 1),
+        _extra_bytes_record(b"a", 1),
+        _extra_bytes_record(b"extra_bytes", 1),
+        _extra_bytes_record(b"X", 1),
+    ])
+    dims = parse_extra_bytes_vlr(payload, 0)
+    assert [name for name, _ in dims] == ["a", "a_2", "extra_bytes_2", "X_2"]
+    dtype = point_record_dtype(0, 20 + 4, dims)
+    assert dtype.itemsize == 24
+
+
+def test_extra_bytes_names_reserved_only_for_own_point_format(tmp_path):
+    payload = _extra_bytes_record(b"nir", 3)
+    assert parse_extra_bytes_vlr(payload, 3) == [("nir", "<u2")]
+    assert parse_extra_bytes_vlr(payload, 8) == [("nir_2", "<u2")]
+
+    # nir は点フォーマット3の標準フィールドではないので、laspy と同じ名前で読める
+    src = make_las(tmp_path / "in.las", 3, "1.2", [("nir", np.uint16)], n=100)
+    with LasMemmap(str(tmp_path / "in.las")) as las:
+        assert las.points.dtype.names[-1] == "nir"
+        assert np.array_equal(las.points["nir"], src.nir)
+        assert np.array_equal(las.points["nir"], src.points["nir"])
+
+
+def test_point_record_dtype_falls_back_on_duplicate_names():
+    dtype = point_record_dtype(0, 22, [("a", "u1"), ("a", "u1")])
+    assert dtype.names[-1] == "extra_bytes"
+    assert dtype.itemsize == 22
@@ -0,0 +1,142 @@
+"""
+pointcloud_core.point_cache のテスト（laspy で作ったLAZと照合する）
+
+    python -m pytest scripts/test_point_cache.py
+"""
+import os
+
+import numpy as np
+import pytest
+
+laspy = pytest.importorskip("laspy")
+if not laspy.LazBackend.detect_available():
+    pytest.skip("LAZ を書けるバックエンド（lazrs など）がありません", allow_module_level=True)
+
+from pointcloud_core import PointCache, clip_cached_points, make_radius_filter
+from pointcloud_core.point_cache import _dir_size
+
+RADIUS = 1.0
+
+
+def make_points(path, n=20_000, seed=0, sort_x=False):
+    """乱数の点で path を書く（拡張子が .laz なら圧縮）。"""
+    rng = np.random.default_rng(seed)
+    header = laspy.LasHeader(point_format=3, version="1.2")
+    header.scales = [0.001, 0.001, 0.001]
+    header.offsets = [1000.0, 2000.0, 0.0]
+    las = laspy.LasData(header)
+    x = rng.uniform(1000, 1020, n)
+    las.x = np.sort(x) if sort_x else x
+    las.y = rng.uniform(2000, 2020, n)
+    las.z = rng.uniform(0, 5, n)
+    las.return_number = rng.integers(1, 4, n)
+    las.number_of_returns = np.full(n, 3)
+    las.intensity = rng.integers(0, 65535, n)
+    las.write(str(path))
+    return laspy.read(str(path))
+
+
+def test_cache_hit_returns_same_points(tmp_path):
+    src = make_points(tmp_path / "in.laz")
+    cache = PointCache(str(tmp_path / "cache"), block_points=4096)
+    logs = []
+    cache.open(str(tmp_path / "in.laz"), log=logs.append)
+    points = cache.open(str(tmp_path / "in.laz"), log=logs.append)
+    assert logs[0].startswith("[cache] miss") and logs[1].startswith("[cache] hit")
+
+    assert points.point_count == len(src.points)
+    assert points.block_count == 5
+    for name in src.point_format.dimension_names:
+        assert np.array_equal(points.column(name), np.asarray(src[name])), name
+    assert np.allclose(points.scaled_xyz(slice(None)), np.vstack([src.x, src.y, src.z]).T)
+
+    record = points.point_record(src.header, np.arange(points.point_count))
+    assert np.array_equal(np.asarray(record.array), np.asarray(src.points.array))
+
+
+def test_same_size_and_mtime_rewrite_gets_new_key(tmp_path):
+    # 非圧縮LASなら点数が同じ別の点でもサイズが揃う
+    path = tmp_path / "in.las"
+    make_points(path, seed=0)
+    cache = PointCache(str(tmp_path / "cache"))
+    first = cache.open(str(path))
+    key = cache.file_key(str(path))
+
+    st = os.stat(path)
+    other = make_points(path, seed=1)
+    # cp -p / rsync -t のように mtime を戻す
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert os.path.getsize(path) == st.st_size
+
+    assert cache.file_key(str(path)) != key
+    second = cache.open(str(path))
+    assert second.path != first.path
+    assert np.array_equal(second.column("X"), np.asarray(other.X))
+
+
+def test_empty_laz(tmp_path):
+    src = make_points(tmp_path / "empty.laz", n=0)
+    cache = PointCache(str(tmp_path / "cache"))
+    points = cache.open(str(tmp_path / "empty.laz"))
+    assert points.point_count == 0
+    assert points.block_count == 0
+    assert set(points.dimension_names) == set(src.point_format.dimension_names)
+    assert len(points.column("X")) == 0
+    assert len(points.blocks_in_bounds([0, 0, 0], [1, 1, 1])) == 0
+
+    with laspy.open(str(tmp_path / "out.las"), mode="w", header=src.header) as writer:
+        assert clip_cached_points(points, [[0.0, 0.0, 0.0]], RADIUS, src.header, writer) == (0, 0)
+    assert len(points.point_record(src.header, slice(0, 0))) == 0
+
+
+def test_lru_eviction_keeps_recently_opened(tmp_path):
+    paths = [tmp_path / f"{name}.laz" for name in "abc"]
+    for seed, path in enumerate(paths):
+        make_points(path, n=5_000, seed=seed)
+    cache = PointCache(str(tmp_path / "cache"))
+    a = cache.open(str(paths[0]))
+    entry_size = _dir_size(a.path)
+    # 2エントリ分だけ入る大きさにする
+    cache.max_bytes = int(entry_size * 2.5)
+
+    b = cache.open(str(paths[1]))
+    cache.open(str(paths[0]))
+    c = cache.open(str(paths[2]))
+
+    assert os.path.isdir(a.path)
+    assert os.path.isdir(c.path)
+    assert not os.path.exists(b.path)
+
+
+def test_concurrent_build_reuses_existing_entry(tmp_path):
+    make_points(tmp_path / "in.laz", n=1_000)
+    cache = PointCache(str(tmp_path / "cache"))
+    points = cache.open(str(tmp_path / "in.laz"))
+    # 別プロセスが同じキーを先に作り終えた後に、こちらの構築が終わった場合
+    meta = cache._build(str(tmp_path / "in.laz"), points.path, 2_000_000)
+    assert meta["point_count"] == 1_000
+    assert sorted(os.listdir(cache.root)) == sorted([os.path.basename(points.path), "index.json"])
+
+
+def test_clip_cached_points_matches_chunk_iterator(tmp_path):
+    # x で並べておくと、ブロックごとの範囲で読み飛ばしが起きる
+    src = make_points(tmp_path / "in.laz", n=30_000, sort_x=True)
+    centers = np.random.default_rng(1).uniform([1000, 2000, 0], [1004, 2020, 5], (20, 3))
+
+    flt = make_radius_filter(centers, RADIUS)
+    with laspy.open(str(tmp_path / "in.laz")) as reader:
+        with laspy.open(str(tmp_path / "plain.las"), mode="w", header=reader.header) as writer:
+            for points in reader.chunk_iterator(7_000):
+                xyz = np.vstack((points.x, points.y, points.z)).T
+                writer.write_points(points[flt.mask(xyz)])
+
+    cache = PointCache(str(tmp_path / "cache"), block_points=4096)
+    cached = cache.open(str(tmp_path / "in.laz"))
+    with laspy.open(str(tmp_path / "cached.las"), mode="w", header=src.header) as writer:
+        n_in, n_out = clip_cached_points(cached, centers, RADIUS, src.header, writer)
+    assert n_in < cached.point_count
+
+    plain = laspy.read(str(tmp_path / "plain.las"))
+    got = laspy.read(str(tmp_path / "cached.las"))
+    assert 0 < n_out == len(plain.points)
+    assert np.array_equal(np.asarray(got.points.array), np.asarray(plain.points.array))
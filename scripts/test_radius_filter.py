@@ -0,0 +1,60 @@
+"""
+pointcloud_core の中心座標CSV読み込みと格子フィルタのテスト（総当たりの距離計算と照合する）
+
+    python -m pytest scripts/test_radius_filter.py
+"""
+import numpy as np
+import pytest
+
+from pointcloud_core import GridRadiusFilter, parse_centers_csv
+
+
+def brute_force_mask(points, centers, radius):
+    d2 = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+    return d2 <= radius * radius
+
+
+def points_on_sphere_axes(centers, radius):
+    """各中心から軸方向にちょうど radius だけ離れた点。"""
+    offsets = np.vstack([np.eye(3), -np.eye(3)]) * radius
+    return (centers[:, None, :] + offsets[None, :, :]).reshape(-1, 3)
+
+
+@pytest.mark.parametrize("radius", [0.3, 0.5, 1.0])
+def test_grid_mask_matches_brute_force(radius):
+    rng = np.random.default_rng(0)
+    # 0.1 刻みに丸めて、セル境界に乗る中心も含める
+    centers = np.round(rng.uniform(0, 5, (50, 3)), 1)
+    points = np.vstack([rng.uniform(-1, 6, (20_000, 3)), points_on_sphere_axes(centers, radius)])
+
+    expected = brute_force_mask(points, centers, radius)
+    assert 0 < expected.sum() < len(points)
+    assert np.array_equal(GridRadiusFilter(centers, radius).mask(points), expected)
+
+
+def test_grid_mask_with_clustered_and_duplicate_centers():
+    rng = np.random.default_rng(1)
+    cluster = rng.uniform(4, 6, (300, 3))
+    duplicates = np.repeat(rng.uniform(1, 9, (3, 3)), 50, axis=0)
+    centers = np.vstack([cluster, duplicates])
+    points = np.vstack([rng.uniform(0, 10, (30_000, 3)), points_on_sphere_axes(centers, 1.0)])
+
+    flt = GridRadiusFilter(centers, 1.0)
+    assert np.array_equal(flt.mask(points), brute_force_mask(points, centers, 1.0))
+
+
+def test_grid_mask_outside_bounds_and_empty():
+    flt = GridRadiusFilter([[0.0, 0.0, 0.0]], 1.0)
+    assert not flt.mask(np.array([[5.0, 0.0, 0.0], [0.0, -1.5, 0.0]])).any()
+    assert flt.mask(np.empty((0, 3))).shape == (0,)
+    with pytest.raises(ValueError):
+        GridRadiusFilter(np.empty((0, 3)), 1.0)
+    with pytest.raises(ValueError):
+        GridRadiusFilter([[0.0, 0.0, 0.0]], 0.0)
+
+
+def test_parse_centers_csv_skips_header_and_invalid_rows():
+    text = "label,x,y,z\nT1,1.5,-2,3,\n\nbad,row\nT2,x,1,2\r\nT3,4,5,6\n"
+    assert np.array_equal(parse_centers_csv(text), [[1.5, -2.0, 3.0], [4.0, 5.0, 6.0]])
+    with pytest.raises(ValueError):
+        parse_centers_csv("label,x,y\nT1,1,2\n")
@@ -1,4 +1,4 @@
-// Pyodide版 - PythonをブラウザでF実行してLAZ処理
+// Pyodide版 - Pythonをブラウザで実行して非圧縮LASを処理（LAZは未対応）
 
 let pyodide = null;
 let lazFile = null;
@@ -41,10 +41,30 @@ function formatFileSize(bytes) {
     return (bytes / (1024 * 1024 * 1024)).toFixed(2) + ' GB';
 }
 
+// 共通処理パッケージ（scripts/pointcloud_core）
+const CORE_PACKAGE_URL = '../scripts/pointcloud_core/';
+const CORE_MODULES = ['__init__.py', 'centers.py', 'clip.py', 'las_memmap.py', 'las_records.py', 'point_cache.py', 'radius_filter.py'];
+// 1チャンクあたりの点数（WASMヒープに載るのはこの分だけ）
+const CHUNK_POINTS = 1000000;
+
+// 共通処理パッケージをPyodideの仮想FSに配置
+async function loadCoreModules() {
+    const dir = '/home/pyodide/pointcloud_core';
+    pyodide.FS.mkdirTree(dir);
+    for (const name of CORE_MODULES) {
+        const res = await fetch(CORE_PACKAGE_URL + name);
+        if (!res.ok) {
+            throw new Error(`${name} の読み込みに失敗しました (${res.status})`);
+        }
+        pyodide.FS.writeFile(`${dir}/${name}`, await res.text());
+    }
+    pyodide.globals.set('CHUNK_POINTS', CHUNK_POINTS);
+}
+
 // Pyodideの初期化
 async function initPyodide() {
     try {
-        statusDiv.textContent = '⏳ Pythonランタイムを初期化しています...（初回は数分かかります）';
+        statusDiv.textContent = '⏳ Pythonランタイムを初期化しています...';
         statusDiv.className = 'status';
         
         addLog('Pyodideを読み込んでいます...');
@@ -53,97 +73,48 @@ async function initPyodide() {
         });
         
         updateProgress(20, 'ランタイム初期化完了');
-        addLog('必要なパッケージをインストールしています...');
+        addLog('numpyを読み込んでいます...');
         
-        // 必要なパッケージをインストール
-        await pyodide.loadPackage(['numpy', 'micropip']);
-        updateProgress(40, 'numpy読込完了');
+        // 必要なのはnumpyのみ（laspy / scipy はインストールしない）
+        await pyodide.loadPackage(['numpy']);
+        updateProgress(60, 'numpy読込完了');
         
-        addLog('laspyをインストールしています...');
-        await pyodide.runPythonAsync(`
-            import micropip
-            await micropip.install('laspy')
-        `);
-        updateProgress(60, 'laspy読込完了');
-        
-        addLog('scipyをインストールしています...');
-        await pyodide.runPythonAsync(`
-            await micropip.install('scipy')
-        `);
-        updateProgress(80, 'scipy読込完了');
+        addLog('共通処理モジュールを読み込んでいます...');
+        await loadCoreModules();
+        updateProgress(80, '共通モジュール読込完了');
         
         // 処理スクリプトを準備
         await pyodide.runPythonAsync(`
-import numpy as np
-import laspy
-from scipy.spatial import cKDTree
 from io import BytesIO
 import js
+from pointcloud_core import clip_las_records, is_compressed_las, parse_centers_csv
 
-def process_laz(laz_data, csv_text, radius):
-    """LAZ/LASファイルを処理してフィルタリング"""
+def process_las(las_data, csv_text, radius):
+    """LASファイルを処理してフィルタリング（las_data は JS の Uint8Array）"""
     
-    # CSVを解析
-    lines = csv_text.strip().split('\\n')
-    centers = []
-    for line in lines[1:]:  # ヘッダーをスキップ
-        if not line.strip():
-            continue
-        parts = line.split(',')
-        if len(parts) >= 4:
-            try:
-                x = float(parts[1])
-                y = float(parts[2])
-                z = float(parts[3])
-                centers.append([x, y, z])
-            except:
-                pass
+    # 先頭だけ転送して圧縮判定
+    if is_compressed_las(las_data.subarray(0, 105).to_py()):
+        raise ValueError('LAZ圧縮ファイルはブラウザ版では処理できません。convert_laz_to_las.py でLASに変換してください')
     
-    centers = np.array(centers)
+    centers = parse_centers_csv(csv_text)
     js.console.log(f"中心座標: {len(centers)}件")
     
-    # LAZ/LASファイルを読み込み
-    laz_buffer = BytesIO(laz_data.to_py())
-    las = laspy.read(laz_buffer)
-    
-    js.console.log(f"総点数: {len(las.points)}")
-    
-    # KD-treeを構築
-    tree = cKDTree(centers)
-    
-    # 点群座標を取得
-    points_xyz = np.vstack([las.x, las.y, las.z]).T
-    
-    # 範囲内の点を検索
-    indices = tree.query_ball_point(points_xyz, radius)
-    
-    # フィルタリング
-    mask = np.array([len(idx) > 0 for idx in indices])
-    filtered_points = las.points[mask]
-    
-    js.console.log(f"抽出点数: {len(filtered_points)}")
-    
-    # 新しいLASファイルを作成
-    header = laspy.LasHeader(point_format=las.header.point_format, version=las.header.version)
-    header.offsets = las.header.offsets
-    header.scales = las.header.scales
-    
-    output_las = laspy.LasData(header)
-    output_las.points = filtered_points
-    
-    # バイトデータとして出力
+    # 点データはチャンク単位でWASMヒープへ転送して処理
     output_buffer = BytesIO()
-    output_las.write(output_buffer)
+    input_points, output_points = clip_las_records(las_data, centers, radius, output_buffer, CHUNK_POINTS)
+    
+    js.console.log(f"総点数: {input_points}")
+    js.console.log(f"抽出点数: {output_points}")
     
     return {
-        'input_points': len(las.points),
-        'output_points': len(filtered_points),
+        'input_points': input_points,
+        'output_points': output_points,
         'data': output_buffer.getvalue()
     }
         `);
         
         updateProgress(100, '初期化完了');
-        statusDiv.textContent = '✅ 準備完了！LAZ/LASファイルを処理できます';
+        statusDiv.textContent = '✅ 準備完了！非圧縮LASファイルを処理できます（LAZは未対応）';
         statusDiv.className = 'status success';
         addLog('✅ 初期化完了！');
         
@@ -161,6 +132,15 @@ def process_laz(laz_data, csv_text, radius):
 // ファイル選択イベント
 lazInput.addEventListener('change', (e) => {
     lazFile = e.target.files[0];
+    if (lazFile && lazFile.name.toLowerCase().endsWith('.laz')) {
+        // 大きなファイルを読み込む前に弾く
+        alert('LAZ圧縮ファイルはブラウザ版では処理できません。scripts/convert_laz_to_las.py でLASに変換してください');
+        lazInput.value = '';
+        lazFile = null;
+        lazLabel.classList.remove('has-file');
+        checkFiles();
+        return;
+    }
     if (lazFile) {
         lazLabel.classList.add('has-file');
         lazInfo.textContent = `${lazFile.name} (${formatFileSize(lazFile.size)})`;
@@ -199,7 +179,7 @@ async function processFiles() {
         addLog(`設定: 半径=${radius}m`);
         
         // ファイルを読み込み
-        addLog('LAZ/LASファイルを読み込んでいます...');
+        addLog('LASファイルを読み込んでいます...');
         const lazArrayBuffer = await lazFile.arrayBuffer();
         const lazUint8Array = new Uint8Array(lazArrayBuffer);
         
@@ -214,7 +194,8 @@ async function processFiles() {
         addLog('点群を解析しています...');
         addLog('大きなファイルの場合、数分かかることがあります...');
         
-        pyodide.globals.set('laz_data', lazUint8Array);
+        // Uint8ArrayはJsProxyのまま渡す（全体をto_py()でコピーしない）
+        pyodide.globals.set('las_data', lazUint8Array);
         pyodide.globals.set('csv_text', csvText);
         pyodide.globals.set('radius', radius);
         
@@ -223,7 +204,7 @@ async function processFiles() {
         // Python処理を実行
         const result = await pyodide.runPythonAsync(`
 import js
-result = process_laz(laz_data, csv_text, radius)
+result = process_las(las_data, csv_text, radius)
 result
         `);
         